@@ -6,11 +6,23 @@
 # ProteomeXchange API 配置
 PX_API_BASE_URL = "https://www.proteomexchange.org"  # 基础 URL
 PX_DATASET_URL = "https://proteomecentral.proteomexchange.org/cgi/GetDataset"  # 数据集查询接口
+PX_SEARCH_URL = PX_DATASET_URL  # 服务端渲染的数据集搜索接口（action=search）
 
 # 请求配置
 REQUEST_TIMEOUT = 30  # 请求超时时间（秒）
 REQUEST_DELAY = 1  # 请求之间的延迟（秒）- 避免请求过快
 MAX_RETRIES = 3  # 最大重试次数
+HTTP_HEADERS = {
+    # XML/JSON 响应压缩后通常只有原来的 1/5~1/10
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept": "application/json, application/xml;q=0.9, */*;q=0.8",
+}
+
+# 缓存配置
+CACHE_DIR = ".px_cache"  # 本地缓存目录（数据集详情、搜索结果）
+CACHE_EXPIRE = 7 * 24 * 3600  # 缓存有效期（秒）
+HTTP_CACHE_DIR = "data/.http_cache"  # 各仓库 API 响应缓存目录（RAW 文件统计）
+HTTP_CACHE_EXPIRE = 24 * 3600  # API 响应缓存有效期（秒）
 
 # 输出配置
 OUTPUT_DIR = "data"  # 输出目录
@@ -22,6 +34,7 @@ EXCEL_SHEET_NAME = "ProteomeXchange Datasets"  # 工作表名称
 # 日志配置
 LOG_LEVEL = "INFO"  # 日志级别: DEBUG, INFO, WARNING, ERROR
 LOG_FILE = "scraper.log"  # 日志文件
+PROGRESS_LOG_INTERVAL = 100  # 每处理多少个数据集输出一次进度日志
 
 # 数据字段配置
 # 我们要提取的数据集字段
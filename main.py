@@ -4,25 +4,39 @@ ProteomeXchange 爬虫主程序
 """
 
 import argparse
+import asyncio
 import logging
+import queue
 import sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from tqdm import tqdm
 
 # 导入项目模块
 import config
 from scraper.px_scraper import ProteomeXchangeScraper
-from scraper.raw_file_counter import count_raw_files_batch
+from scraper.raw_file_counter import RawFileCounter, count_raw_files_for_dataset, create_session
 from utils.excel_writer import ExcelWriter
 
-# 配置日志
+# 配置日志：业务代码只把日志记录放入队列，由后台线程写文件和控制台，避免阻塞事件循环
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [
+    logging.FileHandler(config.LOG_FILE, encoding='utf-8', delay=True),
+    logging.StreamHandler(sys.stdout)
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.SimpleQueue()
+log_listener = QueueListener(_log_queue, *_log_handlers)
+
+# QueueHandler 只放入原始消息，完整格式由监听线程中的处理器统一添加
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+
 logging.basicConfig(
     level=getattr(logging, config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[_queue_handler]
 )
 logger = logging.getLogger(__name__)
 
@@ -60,8 +74,8 @@ def parse_arguments():
   # 限制爬取数量（用于测试）
   python main.py --keyword "intact protein" --max-datasets 10
 
-  # 指定线程数
-  python main.py --keyword "proteomics" --workers 8
+  # 指定同时统计 RAW 文件的数据集数量
+  python main.py --keyword "proteomics" --workers 30
 
   # 跳过 RAW 文件统计（快速模式）
   python main.py --keyword "cancer" --skip-raw-count
@@ -92,8 +106,15 @@ def parse_arguments():
     parser.add_argument(
         '--workers', '-w',
         type=int,
-        default=5,
-        help='RAW 文件统计的线程数（默认: 5）'
+        default=20,
+        help='同时统计 RAW 文件的数据集数量，也是连接池大小（默认: 20）'
+    )
+
+    parser.add_argument(
+        '--concurrency', '-c',
+        type=int,
+        default=8,
+        help='同时获取详情的数据集数量（默认: 8）'
     )
 
     parser.add_argument(
@@ -102,6 +123,13 @@ def parse_arguments():
         help='跳过 RAW 文件统计（快速模式，不获取文件数量）'
     )
 
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest='use_cache',
+        help='不读取本地缓存，重新获取所有数据'
+    )
+
     parser.add_argument(
         '--headless',
         action='store_true',
@@ -119,36 +147,93 @@ def parse_arguments():
     return parser.parse_args()
 
 
-def merge_raw_file_stats(base_datasets: list, raw_stats: dict) -> list:
+async def main_async(args):
     """
-    将 RAW 文件统计信息合并到基础数据集中
+    主流程：在同一个事件循环中完成搜索、详情获取、RAW 文件统计和 Excel 写入
 
     Args:
-        base_datasets: 基础数据集列表
-        raw_stats: RAW 文件统计字典
-
-    Returns:
-        合并后的数据集列表
+        args: 命令行参数
     """
-    merged_data = []
+    # 初始化 Excel 写入器
+    excel_writer = ExcelWriter(
+        output_dir=config.OUTPUT_DIR,
+        sheet_name=config.EXCEL_SHEET_NAME
+    )
 
-    for dataset in base_datasets:
-        pxid = dataset.get('样品编号', '')
+    summary = {'datasets': 0, 'raw_files': 0}
 
-        # 查找对应的 RAW 文件统计
-        stat = raw_stats.get(pxid, {})
+    scraper = ProteomeXchangeScraper(
+        headless=args.headless,
+        concurrency=args.concurrency,
+        use_cache=args.use_cache
+    )
 
-        # 创建合并后的数据
-        merged = dataset.copy()
-        merged['Raw_File_Count'] = stat.get('raw_file_count', 0)
+    async with scraper, create_session(args.workers) as http:
+        # ========== 第一步：搜索数据集 ==========
+        logger.info(f"\n[第一步] 搜索关键词 '{args.keyword}' 的数据集...")
 
-        # 如果有 repository 信息但原数据没有，补充进去
-        if stat.get('repository') and stat['repository'] != 'Unknown':
-            merged.setdefault('Hosting Repository', stat['repository'])
+        datasets = await scraper.search_datasets(
+            keyword=args.keyword,
+            max_datasets=args.max_datasets
+        )
 
-        merged_data.append(merged)
+        if not datasets:
+            logger.warning("没有找到任何数据集")
+            return
 
-    return merged_data
+        # ========== 第二步：获取基础信息、统计 RAW 文件并逐条写入 Excel ==========
+        # 每个数据集拿到基础信息后立即统计 RAW 文件，两者在同一条流水线中并发进行
+        if args.skip_raw_count:
+            logger.info(f"\n[第二步] 获取 {len(datasets)} 个数据集的基础信息（跳过 RAW 文件统计）...")
+        else:
+            logger.info(f"\n[第二步] 获取 {len(datasets)} 个数据集的基础信息并统计 RAW 文件...")
+
+        counter = RawFileCounter(http, use_cache=args.use_cache)
+        progress = tqdm(total=len(datasets), desc="获取数据集信息")
+
+        # RAW 文件统计有独立的并发限制（--workers），与详情获取（--concurrency）互不占用
+        raw_semaphore = asyncio.Semaphore(args.workers)
+
+        async def add_raw_count(details):
+            # 直接在详情字典上补充统计结果（该字典之后不会再被其他地方使用）
+            async with raw_semaphore:
+                raw = await count_raw_files_for_dataset(details['样品编号'], counter)
+            details['Raw_File_Count'] = raw['raw_file_count']
+            # 如果有 repository 信息但原数据没有，补充进去
+            if raw['repository'] not in ('Unknown', 'Error'):
+                details.setdefault('Hosting Repository', raw['repository'])
+            return details
+
+        async def rows():
+            postprocess = None if args.skip_raw_count else add_raw_count
+            async for row in scraper.iter_dataset_details(datasets, postprocess):
+                progress.update(1)
+                row.setdefault('Raw_File_Count', 0)
+                summary['datasets'] += 1
+                summary['raw_files'] += row['Raw_File_Count']
+                yield row
+
+        try:
+            output_path = await excel_writer.write_stream(
+                rows(),
+                filename=args.output,
+                columns=OUTPUT_COLUMNS
+            )
+        finally:
+            progress.close()
+
+    if output_path:
+        logger.info("\n" + "=" * 70)
+        logger.info("✓ 数据导出成功!")
+        logger.info(f"✓ 输出文件: {output_path}")
+        logger.info(f"✓ 数据集数量: {summary['datasets']}")
+
+        if not args.skip_raw_count:
+            logger.info(f"✓ RAW 文件总数: {summary['raw_files']}")
+
+        logger.info("=" * 70)
+    else:
+        logger.warning("没有获取到任何数据")
 
 
 def main():
@@ -156,6 +241,8 @@ def main():
     # 解析命令行参数
     args = parse_arguments()
 
+    log_listener.start()
+
     logger.info("=" * 70)
     logger.info("ProteomeXchange 深度爬虫程序启动")
     logger.info("=" * 70)
@@ -163,117 +250,22 @@ def main():
     logger.info(f"输出文件: {args.output}")
     logger.info(f"最大数据集数量: {args.max_datasets or '全部'}")
     logger.info(f"RAW 文件统计: {'禁用' if args.skip_raw_count else '启用'}")
-    logger.info(f"线程数: {args.workers}")
+    logger.info(f"RAW 统计并发数: {args.workers}")
+    logger.info(f"详情并发数: {args.concurrency}")
+    logger.info(f"使用缓存: {args.use_cache}")
     logger.info(f"无头模式: {args.headless}")
     logger.info("-" * 70)
 
-    # 初始化 Excel 写入器
-    excel_writer = ExcelWriter(
-        output_dir=config.OUTPUT_DIR,
-        sheet_name=config.EXCEL_SHEET_NAME
-    )
-
     try:
-        # ========== 第一步：搜索并获取基础数据集信息 ==========
-        logger.info(f"\n[第一步] 搜索关键词 '{args.keyword}' 的数据集...")
-
-        scraper = ProteomeXchangeScraper(headless=args.headless)
-
-        import asyncio
-
-        async def scrape_and_get_raw_stats():
-            await scraper.start()
-            try:
-                # 搜索数据集
-                datasets = await scraper.search_datasets(
-                    keyword=args.keyword,
-                    max_datasets=args.max_datasets
-                )
-
-                if not datasets:
-                    logger.warning("没有找到任何数据集")
-                    return []
-
-                # 获取基础详细信息
-                logger.info(f"\n获取 {len(datasets)} 个数据集的基础信息...")
-
-                all_details = []
-                for i, ds in enumerate(tqdm(datasets, desc="获取基础信息"), 1):
-                    pxid = ds['pxid']
-                    details = await scraper.get_dataset_details(pxid)
-                    if details:
-                        all_details.append(details)
-                    # 添加延迟避免请求过快
-                    import asyncio
-                    await asyncio.sleep(0.5)
-
-                return all_details
-            finally:
-                await scraper.close()
-
-        base_datasets = asyncio.run(scrape_and_get_raw_stats())
-
-        if not base_datasets:
-            logger.warning("没有获取到任何数据")
-            return
-
-        logger.info(f"基础信息获取完成: {len(base_datasets)} 个数据集")
-
-        # ========== 第二步：统计 RAW 文件（可选）==========
-        if args.skip_raw_count:
-            logger.info("\n[第二步] 跳过 RAW 文件统计（快速模式）")
-            final_datasets = base_datasets
-            # 添加空列
-            for dataset in final_datasets:
-                dataset['Raw_File_Count'] = 0
-        else:
-            logger.info(f"\n[第二步] 统计 RAW 文件（{args.workers} 线程并行）...")
-
-            # 提取所有 PXD ID
-            pxid_list = [ds.get('样品编号', '') for ds in base_datasets if ds.get('样品编号')]
-
-            logger.info(f"需要统计 {len(pxid_list)} 个数据集的文件信息...")
-
-            # 批量统计 RAW 文件
-            raw_stats = count_raw_files_batch(pxid_list, max_workers=args.workers)
-
-            # 合并统计结果
-            final_datasets = merge_raw_file_stats(base_datasets, raw_stats)
-
-            # 统计汇总
-            total_files = sum(ds.get('Raw_File_Count', 0) for ds in final_datasets)
-            logger.info(f"RAW 文件统计完成:")
-            logger.info(f"  - 总文件数: {total_files}")
-
-        # ========== 第三步：写入 Excel ==========
-        logger.info(f"\n[第三步] 写入 Excel 文件...")
-
-        output_path = excel_writer.write_to_excel(
-            data=final_datasets,
-            filename=args.output,
-            columns=OUTPUT_COLUMNS
-        )
-
-        if output_path:
-            logger.info("\n" + "=" * 70)
-            logger.info("✓ 数据导出成功!")
-            logger.info(f"✓ 输出文件: {output_path}")
-            logger.info(f"✓ 数据集数量: {len(final_datasets)}")
-
-            if not args.skip_raw_count:
-                total_files = sum(ds.get('Raw_File_Count', 0) for ds in final_datasets)
-                logger.info(f"✓ RAW 文件总数: {total_files}")
-
-            logger.info("=" * 70)
-        else:
-            logger.error("导出失败")
-
+        asyncio.run(main_async(args))
     except KeyboardInterrupt:
         logger.warning("\n用户中断程序")
     except Exception as e:
         logger.error(f"\n程序执行出错: {e}", exc_info=True)
     finally:
         logger.info("\n程序执行完毕")
+        # 停止前会把队列中剩余的日志全部写出
+        log_listener.stop()
 
 
 if __name__ == "__main__":
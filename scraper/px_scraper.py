@@ -1,47 +1,308 @@
 """
 ProteomeXchange 动态爬虫模块
-使用 Playwright 处理动态加载的页面
+数据集详情通过 GetDataset XML 接口获取，搜索页使用 Playwright 处理动态加载的页面
 """
 
 import asyncio
+import io
 import logging
-from typing import List, Dict, Optional
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional
+import aiohttp
+from diskcache import Cache
+from lxml import etree, html
 from playwright.async_api import async_playwright, Page, Browser
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import config
+from utils.json_utils import loads_json
+from utils.request_coalescer import RequestCoalescer
 
 logger = logging.getLogger(__name__)
 
+# 从链接中提取 pxid 的正则
+_PXID_RE = re.compile(r'[?&]pxid=([^&]+)')
+
+# 本地磁盘缓存：pxid -> 详情、(关键词, 页码) -> 搜索结果
+_cache = Cache(config.CACHE_DIR)
+
+
+# 不影响表格文本提取的资源类型，直接拦截不下载
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+# 统计分析类请求的域名
+BLOCKED_HOSTS_RE = re.compile(r"(google-analytics|doubleclick|googletagmanager|hotjar)")
+
+
+async def _block_resources(route):
+    """拦截图片、字体、统计分析等无关资源"""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS_RE.search(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# 页面提取脚本：在上下文中注入一次，每个页面加载时自动定义提取函数
+PX_EXTRACT_JS = """
+// 从链接中提取 pxid 的正则（只编译一次）
+const PXID_RE = /[?&]pxid=([^&]+)/;
+
+// 详情页中需要的字段标签
+const PX_DETAIL_LABELS = new Set([
+    'Title',
+    'Description',
+    'lab head',
+    'Instrument List',
+    'submitter keyword',
+    'Hosting Repository'
+]);
+
+// 提取详情页表格中指定的7个字段（一次遍历所有行，按标签查表）
+window.__pxExtractDetails = () => {
+    const result = {};
+
+    document.querySelectorAll('tr').forEach(row => {
+        const cells = row.cells;
+        if (cells.length < 2) {
+            return;
+        }
+
+        const label = cells[0].textContent.trim();
+        if (PX_DETAIL_LABELS.has(label)) {
+            result[label] = cells[cells.length - 1].textContent.trim();
+        }
+    });
+
+    return result;
+};
+
+// 提取搜索结果页中的所有数据集链接
+window.__pxExtractSearch = () => {
+    const results = [];
+    const links = document.querySelectorAll('a');
+
+    links.forEach(link => {
+        const href = link.getAttribute('href');
+        if (href && href.includes('?pxid=')) {
+            // 提取 pxid
+            const match = href.match(PXID_RE);
+            if (match) {
+                const pxid = match[1];
+
+                // 查找链接文本或其他信息
+                const text = link.textContent.trim();
+
+                results.push({
+                    'pxid': pxid,
+                    'link_text': text,
+                    'href': href
+                });
+            }
+        }
+    });
+
+    return results;
+};
+"""
+
+
+def parse_dataset_xml(content: bytes) -> Dict[str, str]:
+    """
+    从 GetDataset 接口返回的 XML 中提取详情页的字段
+
+    Args:
+        content: XML 原始字节
+
+    Returns:
+        字段字典（键与详情页表格标签一致）
+    """
+    result = {}
+    instruments = []
+    keywords = []
+    contact = {}
+    stack = []
+
+    # 流式解析，逐个元素处理后立即释放
+    for event, elem in etree.iterparse(io.BytesIO(content), events=('start', 'end')):
+        tag = elem.tag
+
+        if event == 'start':
+            stack.append(tag)
+            if tag == 'DatasetSummary':
+                result['Title'] = elem.get('title', '')
+                result['Hosting Repository'] = elem.get('hostingRepository', '')
+            elif tag == 'Contact':
+                contact = {}
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if tag == 'Description' and parent == 'DatasetSummary':
+            result['Description'] = (elem.text or '').strip()
+        elif tag == 'cvParam':
+            name = elem.get('name', '')
+            value = elem.get('value', '')
+            if parent == 'Instrument':
+                instruments.append(value or name)
+            elif parent == 'KeywordList' and name == 'submitter keyword':
+                keywords.append(value)
+            elif parent == 'Contact':
+                contact[name] = value
+        elif tag == 'Contact':
+            # 只保留课题组负责人的姓名
+            if 'lab head' in contact:
+                result['lab head'] = contact.get('contact name', '')
+
+        elem.clear()
+
+    if instruments:
+        result['Instrument List'] = ', '.join(instruments)
+    if keywords:
+        result['submitter keyword'] = ', '.join(keywords)
+
+    return result
+
+
+def parse_dataset_json(data: Dict) -> Dict[str, str]:
+    """
+    从详情页请求的数据集 JSON（PROXI 格式）中提取详情页的字段
+
+    Args:
+        data: 已解码的 JSON 对象
+
+    Returns:
+        字段字典（键与详情页表格标签一致）
+    """
+    result = {
+        'Title': data.get('title', ''),
+        'Description': data.get('description') or data.get('summary', ''),
+        'Hosting Repository': data.get('hostingRepository', ''),
+    }
+
+    # 仪器、关键词、联系人都是 cvParam（name/value）列表
+    instruments = [item.get('value') or item.get('name', '') for item in data.get('instruments') or []]
+    if instruments:
+        result['Instrument List'] = ', '.join(instruments)
+
+    keywords = [item.get('value', '') for item in data.get('keywords') or []
+                if item.get('name') == 'submitter keyword']
+    if keywords:
+        result['submitter keyword'] = ', '.join(keywords)
+
+    for contact in data.get('contacts') or []:
+        params = {param.get('name'): param.get('value', '') for param in contact}
+        # 只保留课题组负责人的姓名
+        if 'lab head' in params:
+            result['lab head'] = params.get('contact name', '')
+
+    return result
+
 
 class ProteomeXchangeScraper:
     """ProteomeXchange 动态爬虫"""
 
-    def __init__(self, headless: bool = True, timeout: int = 30000):
+    def __init__(self, headless: bool = True, timeout: int = 30000, concurrency: int = 8,
+                 use_cache: bool = True):
         """
         初始化爬虫
 
         Args:
             headless: 是否无头模式（不显示浏览器）
             timeout: 页面加载超时时间（毫秒）
+            concurrency: 同时获取详情的数据集数量
+            use_cache: 是否读取本地缓存（False 时仍会用新结果刷新缓存）
         """
         self.headless = headless
         self.timeout = timeout
+        self.concurrency = concurrency
+        self.use_cache = use_cache
         self.browser = None
+        self.context = None
+        self.page_pool = None
         self.playwright = None
+        self.session = None
+        self._browser_lock = None
+        # 搜索接口是否已返回过数据集（返回过之后才信任它给出的空页）
+        self._api_search_ok = False
+        # 相同 pxid / 搜索页的并发请求只发起一次
+        self._inflight = RequestCoalescer()
 
         logger.info(f"初始化 ProteomeXchange 动态爬虫（headless={headless}）")
 
     async def start(self):
-        """启动浏览器"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=self.headless)
-        logger.info("浏览器已启动")
+        """启动 HTTP 会话（浏览器在第一次需要时才启动）"""
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout / 1000),
+            headers=config.HTTP_HEADERS
+        )
+        self._browser_lock = asyncio.Lock()
+
+    async def _ensure_browser(self):
+        """启动浏览器和页面池（只在接口不可用、需要回退到浏览器时调用）"""
+        async with self._browser_lock:
+            if self.page_pool is not None:
+                return
 
-    async def close(self):
-        """关闭浏览器"""
+            try:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+
+                # 所有页面共享同一个上下文（缓存、Cookie 可复用）
+                self.context = await self.browser.new_context()
+                await self.context.route("**/*", _block_resources)
+                await self.context.add_init_script(script=PX_EXTRACT_JS)
+
+                # 预先创建页面池，每次请求借用一个页面，用完归还
+                page_pool = asyncio.Queue()
+                for _ in range(self.concurrency):
+                    await page_pool.put(await self.context.new_page())
+            except Exception:
+                # 启动失败时释放已创建的部分，下次需要时重新尝试
+                await self._close_browser()
+                raise
+
+            self.page_pool = page_pool
+            logger.info("浏览器已启动")
+
+    async def _close_browser(self):
+        """关闭浏览器（如果已启动）"""
+        if self.context:
+            await self.context.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
-        logger.info("浏览器已关闭")
+        was_running = self.page_pool is not None
+        self.context = self.browser = self.playwright = self.page_pool = None
+        if was_running:
+            logger.info("浏览器已关闭")
+
+    async def close(self):
+        """关闭 HTTP 会话和浏览器"""
+        if self.session:
+            await self.session.close()
+        await self._close_browser()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def _lease_page(self):
+        """从页面池借用一个页面，退出时归还（第一次借用时启动浏览器）"""
+        if self.page_pool is None:
+            await self._ensure_browser()
+        page = await self.page_pool.get()
+        try:
+            yield page
+        finally:
+            await self.page_pool.put(page)
 
     async def search_datasets(self, keyword: str, max_datasets: int = None) -> List[Dict]:
         """
@@ -54,76 +315,48 @@ class ProteomeXchangeScraper:
         Returns:
             数据集列表
         """
-        if not self.browser:
+        if not self.session:
             await self.start()
 
         logger.info(f"搜索关键词: {keyword}")
 
         all_datasets = []
-        page_num = 1
-
-        while True:
-            # 构建搜索 URL（带分页）
-            if page_num == 1:
-                url = f"https://proteomecentral.proteomexchange.org/ui?view=datasets&search={keyword}"
-            else:
-                url = f"https://proteomecentral.proteomexchange.org/ui?view=datasets&pageNumber={page_num}&search={keyword}"
+        seen = set()
 
-            logger.info(f"访问第 {page_num} 页: {url}")
+        # 先单独请求第 1 页；之后每批并发请求多页，直到某页不足 100 条
+        batch = [1]
 
-            page = await self.browser.new_page()
+        while batch:
+            results = await asyncio.gather(
+                *[self._fetch_search_page(keyword, n) for n in batch],
+                return_exceptions=True
+            )
 
-            try:
-                # 访问搜索页面
-                await page.goto(url, timeout=self.timeout, wait_until="networkidle")
-
-                # 等待数据加载
-                await page.wait_for_timeout(3000)  # 额外等待 3 秒确保数据加载
-
-                # 查找当前页的所有数据集链接
-                datasets = await page.evaluate('''() => {
-                    const results = [];
-                    const links = document.querySelectorAll('a');
-
-                    links.forEach(link => {
-                        const href = link.getAttribute('href');
-                        if (href && href.includes('?pxid=')) {
-                            // 提取 pxid
-                            const match = href.match(/[?&]pxid=([^&]+)/);
-                            if (match) {
-                                const pxid = match[1];
-
-                                // 查找链接文本或其他信息
-                                const text = link.textContent.trim();
-
-                                results.push({
-                                    'pxid': pxid,
-                                    'link_text': text,
-                                    'href': href
-                                });
-                            }
-                        }
-                    });
-
-                    return results;
-                }''')
+            for page_num, datasets in zip(batch, results):
+                if isinstance(datasets, Exception):
+                    logger.error(f"搜索第 {page_num} 页失败: {datasets}")
+                    break
 
                 logger.info(f"第 {page_num} 页找到 {len(datasets)} 个数据集")
 
                 # 如果当前页没有数据，说明已经到最后一页
                 if not datasets:
                     logger.info(f"第 {page_num} 页没有数据，停止翻页")
-                    await page.close()
                     break
 
                 # 去重后添加到总列表
+                found_before = len(all_datasets)
                 for ds in datasets:
-                    if ds['pxid'] not in {d['pxid'] for d in all_datasets}:
+                    if ds['pxid'] not in seen:
+                        seen.add(ds['pxid'])
                         all_datasets.append(ds)
 
-                logger.info(f"累计找到 {len(all_datasets)} 个数据集")
+                # 没有新的数据集（例如接口忽略了页码），继续翻页没有意义
+                if len(all_datasets) == found_before:
+                    logger.info(f"第 {page_num} 页没有新的数据集，停止翻页")
+                    break
 
-                await page.close()
+                logger.info(f"累计找到 {len(all_datasets)} 个数据集")
 
                 # 检查是否达到最大数量限制
                 if max_datasets and len(all_datasets) >= max_datasets:
@@ -135,98 +368,328 @@ class ProteomeXchangeScraper:
                 if len(datasets) < 100:
                     logger.info(f"第 {page_num} 页数据量 < 100，已是最后一页")
                     break
+            else:
+                # 本批每页都是满的，继续请求下一批
+                batch_size = self.concurrency
+                if max_datasets:
+                    remaining = max_datasets - len(all_datasets)
+                    batch_size = min(batch_size, -(-remaining // 100))
+                next_page = batch[-1] + 1
+                batch = list(range(next_page, next_page + batch_size))
+                continue
 
-                page_num += 1
-
-            except Exception as e:
-                logger.error(f"搜索第 {page_num} 页失败: {e}")
-                await page.close()
-                break
+            break
 
         logger.info(f"翻页完成，共找到 {len(all_datasets)} 个数据集")
         return all_datasets
 
+    async def _fetch_search_page(self, keyword: str, page_num: int) -> List[Dict]:
+        """
+        获取单个搜索结果页中的数据集链接
+
+        Args:
+            keyword: 搜索关键词
+            page_num: 页码（从 1 开始）
+
+        Returns:
+            当前页的数据集列表
+        """
+        return await self._inflight.run(
+            ('search', keyword, page_num),
+            lambda: self._load_search_page(keyword, page_num)
+        )
+
+    async def _load_search_page(self, keyword: str, page_num: int) -> List[Dict]:
+        """加载并解析单个搜索结果页（优先读取缓存）"""
+        cache_key = ('search', keyword, page_num)
+        if self.use_cache:
+            cached = _cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"第 {page_num} 页命中缓存")
+                return cached
+
+        # 优先使用服务端渲染的搜索接口，接口不可用时再用浏览器渲染搜索页
+        datasets = await self._try_api_search(keyword, page_num)
+        if datasets is not None:
+            # 接口正常返回的空页是真实结果（超出最后一页或没有匹配），同样缓存
+            _cache.set(cache_key, datasets, expire=config.CACHE_EXPIRE)
+            return datasets
+
+        datasets = await self._search_page_with_browser(keyword, page_num)
+
+        # 浏览器得到的空页可能是加载失败，不写入缓存
+        if datasets:
+            _cache.set(cache_key, datasets, expire=config.CACHE_EXPIRE)
+
+        return datasets
+
+    async def _try_api_search(self, keyword: str, page_num: int) -> Optional[List[Dict]]:
+        """
+        通过服务端渲染的搜索接口获取数据集链接（无需浏览器）
+
+        Args:
+            keyword: 搜索关键词
+            page_num: 页码（从 1 开始）
+
+        Returns:
+            当前页的数据集列表（已确认接口可用时，超出最后一页为空列表）；
+            接口不可用或无法确认返回的是结果页时返回 None
+        """
+        params = {'action': 'search', 'filterstr': keyword, 'pageNumber': page_num}
+        # 会话默认请求 JSON/XML，这里明确要求 HTML 结果页
+        headers = {'Accept': 'text/html'}
+
+        try:
+            async with self.session.get(config.PX_SEARCH_URL, params=params, headers=headers) as response:
+                if response.status != 200 or 'html' not in response.content_type:
+                    return None
+                body = await response.read()
+
+            datasets = []
+            for link in html.fromstring(body).xpath("//a[contains(@href, '?pxid=')]"):
+                href = link.get('href')
+                match = _PXID_RE.search(href)
+                if match:
+                    datasets.append({
+                        'pxid': match.group(1),
+                        'link_text': link.text_content().strip(),
+                        'href': href
+                    })
+
+            logger.debug(f"搜索接口第 {page_num} 页返回 {len(datasets)} 个数据集")
+
+            if datasets:
+                self._api_search_ok = True
+            elif page_num == 1 or not self._api_search_ok:
+                # 无法确认接口返回的是真正的结果页（第一页为空，或接口从未返回过数据），交给浏览器判断
+                return None
+
+            return datasets
+
+        except Exception as e:
+            logger.debug(f"搜索接口第 {page_num} 页失败: {e}")
+            return None
+
+    async def _search_page_with_browser(self, keyword: str, page_num: int) -> List[Dict]:
+        """
+        通过浏览器渲染搜索页获取数据集链接（搜索接口不可用时的回退方案）
+
+        Args:
+            keyword: 搜索关键词
+            page_num: 页码（从 1 开始）
+
+        Returns:
+            当前页的数据集列表
+        """
+        # 构建搜索 URL（带分页）
+        if page_num == 1:
+            url = f"https://proteomecentral.proteomexchange.org/ui?view=datasets&search={keyword}"
+        else:
+            url = f"https://proteomecentral.proteomexchange.org/ui?view=datasets&pageNumber={page_num}&search={keyword}"
+
+        logger.debug(f"访问第 {page_num} 页: {url}")
+
+        async with self._lease_page() as page:
+            # 访问搜索页面
+            await page.goto(url, timeout=self.timeout, wait_until="domcontentloaded")
+
+            # 等待数据集链接出现（超时说明当前页没有数据，下面会提取到空列表）
+            try:
+                await page.wait_for_selector("a[href*='?pxid=']", timeout=self.timeout)
+            except PlaywrightTimeoutError:
+                logger.debug(f"第 {page_num} 页等待数据集链接超时")
+
+            # 查找当前页的所有数据集链接
+            datasets = await page.evaluate("() => window.__pxExtractSearch()")
+
+        return datasets
+
     async def get_dataset_details(self, pxid: str) -> Optional[Dict]:
         """
         获取数据集详细信息
 
+        优先通过 GetDataset XML 接口获取，失败时回退到浏览器渲染详情页
+
         Args:
             pxid: 数据集 ID（如 PXD055745）
 
         Returns:
             数据集详细信息字典
         """
-        if not self.browser:
+        return await self._inflight.run(('details', pxid), lambda: self._load_dataset_details(pxid))
+
+    async def _load_dataset_details(self, pxid: str) -> Optional[Dict]:
+        """获取并整理单个数据集的详情（优先读取缓存）"""
+        cache_key = ('details', pxid)
+        if self.use_cache:
+            cached = _cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"{pxid} 命中缓存")
+                return cached
+
+        if not self.session:
             await self.start()
 
-        url = f"https://proteomecentral.proteomexchange.org/ui?pxid={pxid}"
+        logger.debug(f"获取数据集详情: {pxid}")
 
-        logger.info(f"获取数据集详情: {pxid}")
+        try:
+            result = await self._fetch_details_from_api(pxid)
+            if not any(result.values()):
+                raise ValueError("XML 中没有找到任何字段")
+        except Exception as e:
+            logger.warning(f"接口获取详情失败 {pxid}，回退到浏览器: {e}")
+            result = await self._fetch_details_from_browser(pxid)
+            if result is None:
+                return None
+
+        # 构建元数据网址
+        metadata_url = f"https://proteomecentral.proteomexchange.org/ui?pxid={pxid}"
+
+        # 按照指定顺序重新组织字段（最后一列添加元数据网址）
+        ordered_details = {
+            '样品编号': pxid,
+            'Title': result.get('Title', ''),
+            'lab head': result.get('lab head', ''),
+            'Description': result.get('Description', ''),
+            'Instrument List': result.get('Instrument List', ''),
+            'submitter keyword': result.get('submitter keyword', ''),
+            'Hosting Repository': result.get('Hosting Repository', ''),
+            '元数据网址': metadata_url
+        }
+
+        logger.debug(f"成功提取 {len([v for v in ordered_details.values() if v])} 个非空字段")
+
+        _cache.set(cache_key, ordered_details, expire=config.CACHE_EXPIRE)
+
+        return ordered_details
+
+    async def _fetch_details_from_api(self, pxid: str) -> Dict[str, str]:
+        """
+        通过 GetDataset XML 接口获取详情字段
+
+        Args:
+            pxid: 数据集 ID
+
+        Returns:
+            字段字典
+        """
+        url = f"{config.PX_DATASET_URL}?ID={pxid}&outputMode=XML"
         logger.debug(f"URL: {url}")
 
-        page = await self.browser.new_page()
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            content = await response.read()
 
-        try:
-            await page.goto(url, timeout=self.timeout, wait_until="networkidle")
-            await page.wait_for_timeout(2000)  # 等待动态内容加载
-
-            # 使用 JavaScript 提取指定的7个字段
-            result = await page.evaluate('''() => {
-                const result = {};
-
-                // 查找所有表格中的数据
-                const tables = document.querySelectorAll('table');
-                tables.forEach(table => {
-                    const rows = table.querySelectorAll('tr');
-                    rows.forEach(row => {
-                        const headerCell = row.querySelector('th, td:first-child');
-                        const dataCell = row.querySelector('td:not(:first-child), td:last-child');
-
-                        if (headerCell && dataCell) {
-                            const label = headerCell.textContent.trim();
-                            const value = dataCell.textContent.trim();
-
-                            // 只保存我们需要的字段
-                            if (label === 'Title' ||
-                                label === 'Description' ||
-                                label === 'lab head' ||
-                                label === 'Instrument List' ||
-                                label === 'submitter keyword' ||
-                                label === 'Hosting Repository') {
-                                result[label] = value;
-                            }
-                        }
-                    });
-                });
+        return parse_dataset_xml(content)
 
-                return result;
-            }''')
-
-            # 构建元数据网址
-            metadata_url = f"https://proteomecentral.proteomexchange.org/ui?pxid={pxid}"
-
-            # 按照指定顺序重新组织字段（最后一列添加元数据网址）
-            ordered_details = {
-                '样品编号': pxid,
-                'Title': result.get('Title', ''),
-                'lab head': result.get('lab head', ''),
-                'Description': result.get('Description', ''),
-                'Instrument List': result.get('Instrument List', ''),
-                'submitter keyword': result.get('submitter keyword', ''),
-                'Hosting Repository': result.get('Hosting Repository', ''),
-                '元数据网址': metadata_url
-            }
+    async def _fetch_details_from_browser(self, pxid: str) -> Optional[Dict[str, str]]:
+        """
+        通过浏览器渲染详情页获取详情字段（接口不可用时的回退方案）
+
+        Args:
+            pxid: 数据集 ID
 
-            logger.info(f"成功提取 {len([v for v in ordered_details.values() if v])} 个非空字段")
+        Returns:
+            字段字典，失败时返回 None
+        """
+        url = f"https://proteomecentral.proteomexchange.org/ui?pxid={pxid}"
+        logger.debug(f"URL: {url}")
 
-            return ordered_details
+        try:
+            async with self._lease_page() as page:
+                # 页面加载时会请求后端接口获取该数据集的 JSON，直接拦截该响应
+                captured = asyncio.get_running_loop().create_future()
+
+                def on_response(response):
+                    if (not captured.done() and pxid in response.url
+                            and response.request.resource_type in ('xhr', 'fetch')):
+                        captured.set_result(response)
+
+                page.on("response", on_response)
+
+                # 页面加载、等待接口响应和等待表格渲染共用一个截止时间，单个数据集最多占用页面 timeout
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + self.timeout / 1000
+
+                def remaining_ms() -> float:
+                    # Playwright 的 timeout=0 表示不限时，因此至少保留 1 毫秒
+                    return max((deadline - loop.time()) * 1000, 1)
+
+                try:
+                    # 不等待页面加载完成，拿到接口响应即可
+                    await page.goto(url, timeout=remaining_ms(), wait_until="commit")
+
+                    try:
+                        response = await asyncio.wait_for(captured, remaining_ms() / 1000)
+                        result = parse_dataset_json(loads_json(await response.body()))
+                        if any(result.values()):
+                            return result
+                    except Exception as e:
+                        logger.debug(f"未能从接口响应中解析 {pxid}: {e}")
+
+                    # 等待详情表格渲染出需要的字段
+                    await page.wait_for_function(
+                        "Array.from(document.querySelectorAll('table tr'))"
+                        ".some(r => /Title|Description|Hosting Repository/.test(r.textContent))",
+                        timeout=remaining_ms()
+                    )
+
+                    # 使用注入的提取函数获取指定的7个字段
+                    return await page.evaluate("() => window.__pxExtractDetails()")
+                finally:
+                    # 页面会被复用，移除本次注册的监听器
+                    page.remove_listener("response", on_response)
 
         except Exception as e:
             logger.error(f"获取详情失败 {pxid}: {e}")
-            await page.close()
             return None
 
-    async def scrape_all(self, keyword: str, max_datasets: int = None) -> List[Dict]:
+    async def iter_dataset_details(
+            self, datasets: List[Dict],
+            postprocess: Optional[Callable[[Dict], Awaitable[Dict]]] = None) -> AsyncIterator[Dict]:
+        """
+        并发获取多个数据集的详情，按完成顺序逐个返回
+
+        Args:
+            datasets: search_datasets 返回的数据集列表
+            postprocess: 对每条详情执行的附加异步处理（不占用详情的并发限制，需自行限流）
+
+        Yields:
+            数据集详细信息字典（获取失败的数据集会被跳过）
+        """
+        # 信号量限制并发数，替代逐个请求之间的固定延迟
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _one(ds):
+            try:
+                async with semaphore:
+                    details = await self.get_dataset_details(ds['pxid'])
+                # 附加处理在释放详情并发槽之后进行，由 postprocess 自行控制并发
+                if details and postprocess:
+                    details = await postprocess(details)
+            except Exception as e:
+                logger.warning(f"跳过 {ds['pxid']}: {e}")
+                return None
+            if not details:
+                logger.warning(f"跳过 {ds['pxid']}")
+            return details
+
+        tasks = [asyncio.create_task(_one(ds)) for ds in datasets]
+
+        try:
+            for done, future in enumerate(asyncio.as_completed(tasks), 1):
+                details = await future
+                # 逐条日志改为 DEBUG，这里只定期输出一次进度
+                if done % config.PROGRESS_LOG_INTERVAL == 0:
+                    logger.info(f"详情进度 {done}/{len(tasks)}")
+                if details:
+                    yield details
+        finally:
+            # 调用方提前停止迭代时取消剩余任务
+            for task in tasks:
+                task.cancel()
+
+    async def scrape_all(self, keyword: str, max_datasets: int = None) -> AsyncIterator[Dict]:
         """
         爬取搜索关键词对应的所有数据集及其详情（支持多页）
 
@@ -234,37 +697,24 @@ class ProteomeXchangeScraper:
             keyword: 搜索关键词
             max_datasets: 最大数据集数量（None 表示全部）
 
-        Returns:
-            所有数据集的详细信息列表
+        Yields:
+            数据集详细信息字典（按获取完成的顺序）
         """
         # 搜索数据集（带分页支持）
         datasets = await self.search_datasets(keyword, max_datasets=max_datasets)
 
         if not datasets:
             logger.warning("没有找到数据集")
-            return []
+            return
 
         logger.info(f"开始爬取 {len(datasets)} 个数据集的详细信息")
 
-        all_details = []
+        count = 0
+        async for details in self.iter_dataset_details(datasets):
+            count += 1
+            yield details
 
-        for i, ds in enumerate(datasets, 1):
-            pxid = ds['pxid']
-            logger.info(f"[{i}/{len(datasets)}] 爬取 {pxid}...")
-
-            details = await self.get_dataset_details(pxid)
-
-            if details:
-                all_details.append(details)
-            else:
-                logger.warning(f"跳过 {pxid}")
-
-            # 添加延迟避免请求过快
-            await asyncio.sleep(1)
-
-        logger.info(f"完成！共获取 {len(all_details)} 个数据集的详细信息")
-
-        return all_details
+        logger.info(f"完成！共获取 {count} 个数据集的详细信息")
 
 
 # 便捷函数：同步运行异步代码
@@ -282,12 +732,7 @@ def scrape_datasets_sync(keyword: str, max_datasets: int = None,
         数据集详细信息列表
     """
     async def _scrape():
-        scraper = ProteomeXchangeScraper(headless=headless)
-        await scraper.start()
-        try:
-            result = await scraper.scrape_all(keyword, max_datasets)
-            return result
-        finally:
-            await scraper.close()
+        async with ProteomeXchangeScraper(headless=headless) as scraper:
+            return [details async for details in scraper.scrape_all(keyword, max_datasets)]
 
     return asyncio.run(_scrape())
@@ -8,19 +8,42 @@
 - .wiff / .wiff2 - AB Sciex 仪器
 """
 
+import asyncio
+import io
 import logging
-import xml.etree.ElementTree as ET
-import json
+import os
 import re
-from typing import Dict, Optional, Tuple, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Tuple, List
+import aiohttp
+from diskcache import Cache
+from lxml import etree
+
+import config
+from utils.json_utils import loads_json
+from utils.request_coalescer import RequestCoalescer
 
 logger = logging.getLogger(__name__)
 
 
+# 仓库 API 响应的本地磁盘缓存（重复运行时只请求新的数据集）
+_http_cache = Cache(config.HTTP_CACHE_DIR)
+
+# 仓库自身编号的前缀（这类编号可直接确定仓库，无需先查询 PX XML）
+_PREFIX_REPO = {
+    'MSV': 'MassIVE',
+    'JPST': 'jPOST',
+    'IPX': 'iProX',
+}
+
+# 从外部链接中提取 JPOST / MassIVE 编号
+_JPST_RE = re.compile(r'(JPST\d+)')
+_MSV_RE = re.compile(r'(MSV\d+)')
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
 # 支持的原始文件扩展名（按长度排序，长的优先匹配）
 RAW_EXTENSIONS = [
     '.raw.zip',      # 压缩的 Thermo RAW 文件
@@ -34,88 +57,182 @@ RAW_EXTENSIONS = [
 ]
 
 
+# 所有扩展名合并成一个忽略大小写的正则，匹配开销不随扩展名数量增长，也无需先转小写
+_RAW_SUFFIX_ALTERNATION = r'(?:' + '|'.join(re.escape(ext) for ext in RAW_EXTENSIONS) + r')'
+# \Z 只匹配字符串末尾（$ 还会匹配末尾换行符之前的位置）
+_RAW_SUFFIX_RE = re.compile(_RAW_SUFFIX_ALTERNATION + r'\Z', re.IGNORECASE)
+# 多行版本：对换行拼接的文件名列表一次扫描，每行最多匹配一次
+_RAW_SUFFIX_LINES_RE = re.compile(_RAW_SUFFIX_ALTERNATION + r'$', re.IGNORECASE | re.MULTILINE)
+
+
 def is_raw_file(filename: str) -> bool:
     """判断文件是否是原始文件"""
-    filename_lower = filename.lower()
-    for ext in RAW_EXTENSIONS:
-        if filename_lower.endswith(ext):
-            return True
-    return False
+    return _RAW_SUFFIX_RE.search(filename) is not None
+
+
+def count_raw_file_names(filenames: Iterable[str]) -> int:
+    """
+    统计文件名列表中的原始文件数量
+
+    把文件名拼成一个字符串后由正则引擎一次扫描完成，
+    大文件列表（上万个文件）不再逐个调用 is_raw_file
+
+    Args:
+        filenames: 文件名序列
+    """
+    return len(_RAW_SUFFIX_LINES_RE.findall('\n'.join(filenames)))
+
+
+def create_session(max_connections: int = 100, per_host: int = None) -> aiohttp.ClientSession:
+    """
+    创建供所有统计任务共享的 aiohttp 会话（复用 TCP/TLS 连接）
+
+    Args:
+        max_connections: 连接池大小，应不小于并发任务数
+        per_host: 单个主机的最大连接数（默认与连接池大小相同）。
+                  每个数据集都要请求 proteomecentral，该值小于并发数时任务会排队等待连接
+    """
+    connector = aiohttp.TCPConnector(
+        limit=max_connections,
+        limit_per_host=per_host or max_connections,
+        ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(connector=connector, headers=config.HTTP_HEADERS)
 
 
 class RawFileCounter:
     """原始文件统计器"""
 
-    def __init__(self, timeout: int = 30, max_retries: int = 3):
-        self.timeout = timeout
+    def __init__(self, session: aiohttp.ClientSession, timeout: int = 30, max_retries: int = 3,
+                 use_cache: bool = True):
+        """
+        初始化统计器
+
+        Args:
+            session: 共享的 aiohttp 会话
+            timeout: 单次请求超时时间（秒）
+            max_retries: 最大重试次数
+            use_cache: 是否读取本地磁盘缓存（新结果总会写入缓存）
+        """
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.max_retries = max_retries
-        self.session = self._create_session()
-
-    def _create_session(self) -> requests.Session:
-        """创建带重试机制的 Session"""
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=self.max_retries,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
-
-    def _get_repository_and_links(self, pxid: str) -> Tuple[Optional[str], Dict[str, str]]:
+        self.use_cache = use_cache
+        # 相同 URL 的并发 GET 请求只发起一次
+        self._inflight = RequestCoalescer()
+
+    async def _request(self, method: str, url: str, **kwargs) -> Tuple[int, bytes]:
+        """
+        发送请求，对限流、服务端错误和连接错误按指数退避重试
+
+        Returns:
+            (状态码, 响应内容)
+        """
+        if method != 'GET':
+            return await self._send(method, url, **kwargs)
+
+        key = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+        if self.use_cache:
+            cached = _http_cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = await self._inflight.run(key, lambda: self._send(method, url, **kwargs))
+
+        # 只缓存成功的响应，失败的请求下次运行时重新获取
+        if result[0] == 200:
+            _http_cache.set(key, result, expire=config.HTTP_CACHE_EXPIRE)
+
+        return result
+
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[int, bytes]:
+        """实际发送请求（带重试）"""
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                async with self.session.request(method, url, timeout=self.timeout, **kwargs) as response:
+                    if response.status not in RETRY_STATUS_CODES or last_attempt:
+                        return response.status, await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last_attempt:
+                    raise
+
+            await asyncio.sleep(2 ** attempt)
+
+    async def _parse_px_xml(self, pxid: str) -> Dict:
         """
-        从 XML 获取仓库类型和外部链接
+        下载并一次性流式解析 ProteomeXchange XML，同时提取仓库、外部链接和 RAW 文件数
 
         Returns:
-            (仓库名称, 链接字典)
+            {'repository': 仓库名称, 'links': 链接字典, 'raw_file_count': DatasetFileList 中的 RAW 文件数}
         """
         url = f"https://proteomecentral.proteomexchange.org/cgi/GetDataset?ID={pxid}&outputMode=XML"
 
+        empty = {'repository': None, 'links': {}, 'raw_file_count': 0}
+
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            root = ET.fromstring(response.content)
+            status, content = await self._request('GET', url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"获取 {pxid} XML 失败: {e}")
+            return empty
 
-            # 获取仓库
-            dataset_summary = root.find('.//DatasetSummary')
-            repository = None
-            if dataset_summary is not None:
-                repository = dataset_summary.get('hostingRepository')
+        # 非 200 直接按无结果处理，不构造异常
+        if status != 200:
+            logger.error(f"获取 {pxid} XML 失败: HTTP {status}")
+            return empty
 
-            # 获取外部链接
+        try:
+            repository = None
             links = {}
-            for full_link in root.findall('.//FullDatasetLink'):
-                for cv_param in full_link.findall('.//cvParam'):
-                    name = cv_param.get('name', '')
-                    value = cv_param.get('value', '')
+            raw_file_count = 0
+            in_link = False
+
+            # 只关注需要的元素，处理完立即释放
+            tags = ('DatasetSummary', 'FullDatasetLink', 'cvParam', 'DatasetFile')
+            for event, elem in etree.iterparse(io.BytesIO(content), events=('start', 'end'), tag=tags):
+                tag = elem.tag
+
+                if event == 'start':
+                    if tag == 'DatasetSummary':
+                        # 获取仓库
+                        repository = elem.get('hostingRepository')
+                    elif tag == 'FullDatasetLink':
+                        in_link = True
+                    continue
+
+                if tag == 'FullDatasetLink':
+                    in_link = False
+                elif tag == 'cvParam' and in_link:
+                    # 获取外部链接
+                    value = elem.get('value', '')
                     if value:
-                        links[name] = value
+                        links[elem.get('name', '')] = value
+                elif tag == 'DatasetFile':
+                    # 统计 DatasetFileList 中的原始文件
+                    if is_raw_file(elem.get('name', '')):
+                        raw_file_count += 1
+                elem.clear()
 
-            return repository, links
+            return {'repository': repository, 'links': links, 'raw_file_count': raw_file_count}
 
-        except Exception as e:
-            logger.error(f"获取 {pxid} XML 失败: {e}")
-            return None, {}
+        except etree.XMLSyntaxError as e:
+            logger.error(f"解析 {pxid} XML 失败: {e}")
+            return empty
 
-    def _count_from_jpost(self, jpost_id: str) -> int:
+    async def _count_from_jpost(self, jpost_id: str) -> int:
         """从 JPOST API 获取文件数量"""
         # JPOST ID 格式: JPST004334
         url = f"https://repository.jpostdb.org/api/proteome/v1/jpost_files?dataset_id={jpost_id}"
 
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            if response.status_code == 200:
-                data = response.json()
+            status, content = await self._request('GET', url)
+            if status == 200:
+                data = loads_json(content)
                 files = data.get('data', data.get('files', []))
 
-                count = 0
-                for file_info in files:
-                    file_name = file_info.get('path', file_info.get('name', ''))
-                    if is_raw_file(file_name):
-                        count += 1
+                count = count_raw_file_names(
+                    file_info.get('path', file_info.get('name', '')) for file_info in files
+                )
 
                 logger.debug(f"JPOST {jpost_id}: {count} RAW files")
                 return count
@@ -124,33 +241,31 @@ class RawFileCounter:
 
         return 0
 
-    def _count_from_massive(self, massive_id: str) -> int:
+    async def _count_from_massive(self, massive_id: str) -> int:
         """从 MassIVE API 获取文件数量"""
         # MassIVE ID 格式: MSV000097430
         url = "https://massive.ucsd.edu/ProteoSAFe/QueryDatasets"
 
         try:
             params = {'query': massive_id}
-            response = self.session.post(url, data=params, timeout=self.timeout)
+            status, content = await self._request('POST', url, data=params)
 
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = loads_json(content)
 
                 # 尝试从 datasets_json.jsp 获取详细文件列表
                 task_id = data.get('row_data', [{}])[0].get('task', '')
                 if task_id:
                     json_url = f"https://massive.ucsd.edu/ProteoSAFe/datasets_json.jsp?task={task_id}"
-                    json_response = self.session.get(json_url, timeout=self.timeout)
+                    json_status, json_content = await self._request('GET', json_url)
 
-                    if json_response.status_code == 200:
-                        json_data = json_response.json()
+                    if json_status == 200:
+                        json_data = loads_json(json_content)
                         files = json_data.get('files', json_data.get('dataset_files', []))
 
-                        count = 0
-                        for file_info in files:
-                            file_name = file_info.get('fileName', file_info.get('name', ''))
-                            if is_raw_file(file_name):
-                                count += 1
+                        count = count_raw_file_names(
+                            file_info.get('fileName', file_info.get('name', '')) for file_info in files
+                        )
 
                         logger.debug(f"MassIVE {massive_id}: {count} RAW files")
                         return count
@@ -159,16 +274,26 @@ class RawFileCounter:
 
         return 0
 
-    def _count_from_pride_api(self, pxid: str) -> int:
+    async def _count_from_pride_api(self, pxid: str) -> int:
         """从 PRIDE API 获取 RAW 文件数量"""
         url = "https://www.ebi.ac.uk/pride/ws/archive/v2/files"
 
         try:
-            params = {'accession': pxid, 'fileCategory': 'RAW'}
-            response = self.session.get(url, params=params, timeout=self.timeout)
-
-            if response.status_code == 200:
-                data = response.json()
+            # 只请求一条记录，从分页信息中读取总数，避免下载完整文件列表
+            params = {'accession': pxid, 'fileCategory': 'RAW', 'pageSize': 1, 'page': 0}
+            status, content = await self._request('GET', url, params=params)
+
+            if status == 200:
+                data = loads_json(content)
+                total = (data.get('page') or {}).get('totalElements') if data else None
+                if total is not None:
+                    logger.debug(f"PRIDE {pxid}: {total} RAW files")
+                    return total
+
+                # 接口没有返回分页信息时，按完整列表统计
+                params = {'accession': pxid, 'fileCategory': 'RAW'}
+                status, content = await self._request('GET', url, params=params)
+                data = loads_json(content) if status == 200 else None
                 if data and '_embedded' in data:
                     files = data['_embedded'].get('files', [])
                     logger.debug(f"PRIDE {pxid}: {len(files)} RAW files")
@@ -178,25 +303,43 @@ class RawFileCounter:
 
         return 0
 
-    def count_raw_files(self, pxid: str) -> Tuple[int, str]:
+    async def _count_from_native_id(self, repository: str, dataset_id: str) -> int:
+        """根据仓库自身的编号（如 MSV000097430、JPST004334）统计文件数量"""
+        if repository == 'MassIVE':
+            return await self._count_from_massive(dataset_id)
+        if repository == 'jPOST':
+            return await self._count_from_jpost(dataset_id)
+        # iProX 暂不支持
+        return 0
+
+    async def count_raw_files(self, pxid: str) -> Tuple[int, str]:
         """
         统计指定数据集的 RAW 文件数量
 
         Args:
-            pxid: 数据集 ID (如 PXD000001)
+            pxid: 数据集 ID (如 PXD000001，也支持 MSV/JPST/IPX 开头的仓库编号)
 
         Returns:
             (文件数量, 仓库名称)
         """
-        # 首先从 XML 获取仓库信息和链接
-        repository, links = self._get_repository_and_links(pxid)
+        # 仓库自身的编号直接调用对应仓库的 API，省去一次 PX XML 请求
+        for prefix, repository in _PREFIX_REPO.items():
+            if pxid.startswith(prefix):
+                count = await self._count_from_native_id(repository, pxid)
+                logger.debug(f"{pxid} ({repository}): {count} 个原始文件")
+                return count, repository
+
+        # 一次请求、一次解析得到仓库信息、链接和 XML 中的文件列表统计
+        xml_info = await self._parse_px_xml(pxid)
+        repository, links = xml_info['repository'], xml_info['links']
 
         if not repository:
             return 0, 'Unknown'
 
-        # 首先尝试从 XML 的 DatasetFileList 获取（如果有）
-        xml_count = self._count_from_xml_datasetfilelist(pxid)
+        # 首先使用 XML 的 DatasetFileList 统计结果（如果有）
+        xml_count = xml_info['raw_file_count']
         if xml_count > 0:
+            logger.debug(f"{pxid} XML: {xml_count} RAW files")
             return xml_count, repository
 
         # 根据仓库类型调用相应的 API
@@ -204,78 +347,63 @@ class RawFileCounter:
         count = 0
 
         if 'pride' in repository_lower:
-            count = self._count_from_pride_api(pxid)
+            count = await self._count_from_pride_api(pxid)
 
         elif 'jpost' in repository_lower:
             # 从链接中提取 JPOST ID (如 JPST004334)
             jpost_id = None
             for name, value in links.items():
                 if 'jPOST dataset URI' in name or 'jPOST dataset identifier' in name:
-                    match = re.search(r'(JPST\d+)', value)
+                    match = _JPST_RE.search(value)
                     if match:
                         jpost_id = match.group(1)
                         break
 
             if jpost_id:
-                count = self._count_from_jpost(jpost_id)
+                count = await self._count_from_jpost(jpost_id)
 
         elif 'massive' in repository_lower:
             # 从链接中提取 MassIVE ID (如 MSV000097430)
             massive_id = None
             for name, value in links.items():
                 if 'MassIVE dataset identifier' in name:
-                    match = re.search(r'(MSV\d+)', value)
+                    match = _MSV_RE.search(value)
                     if match:
                         massive_id = match.group(1)
                         break
                 # 也尝试从 FTP 链接提取
                 if 'FTP location' in name:
-                    match = re.search(r'(MSV\d+)', value)
+                    match = _MSV_RE.search(value)
                     if match:
                         massive_id = match.group(1)
                         break
 
             if massive_id:
-                count = self._count_from_massive(massive_id)
+                count = await self._count_from_massive(massive_id)
 
         elif 'iprox' in repository_lower:
             # iProX 可能可以从 XML 读取，返回 0 表示暂不支持
             count = 0
 
-        logger.info(f"{pxid} ({repository}): {count} 个原始文件")
+        logger.debug(f"{pxid} ({repository}): {count} 个原始文件")
         return count, repository
 
-    def _count_from_xml_datasetfilelist(self, pxid: str) -> int:
-        """从 XML 的 DatasetFileList 统计文件"""
-        url = f"https://proteomecentral.proteomexchange.org/cgi/GetDataset?ID={pxid}&outputMode=XML"
-
-        try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            root = ET.fromstring(response.content)
-
-            file_count = 0
-            for dataset_file in root.findall('.//DatasetFile'):
-                file_name = dataset_file.get('name', '')
-                if is_raw_file(file_name):
-                    file_count += 1
-
-            if file_count > 0:
-                logger.debug(f"{pxid} XML: {file_count} RAW files")
 
-            return file_count
-
-        except Exception as e:
-            logger.debug(f"XML 解析失败: {e}")
-            return 0
+async def count_raw_files_for_dataset(pxid: str, counter: RawFileCounter = None) -> Dict[str, any]:
+    """
+    为单个数据集统计 RAW 文件（用于并发批量统计）
 
-
-def count_raw_files_for_dataset(pxid: str) -> Dict[str, any]:
-    """为单个数据集统计 RAW 文件（用于多线程）"""
-    counter = RawFileCounter()
+    Args:
+        pxid: 数据集 ID
+        counter: 共享的统计器；批量统计时应传入同一个实例以复用连接，
+                 不传时临时创建一个只用于本次统计的会话
+    """
+    if counter is None:
+        async with create_session(1) as session:
+            return await count_raw_files_for_dataset(pxid, RawFileCounter(session))
 
     try:
-        count, repository = counter.count_raw_files(pxid)
+        count, repository = await counter.count_raw_files(pxid)
 
         return {
             'pxid': pxid,
@@ -294,30 +422,56 @@ def count_raw_files_for_dataset(pxid: str) -> Dict[str, any]:
         }
 
 
-def count_raw_files_batch(pxid_list: list, max_workers: int = 5) -> Dict[str, Dict]:
-    """批量统计多个数据集的 RAW 文件（多线程）"""
-    results = {}
-
+async def count_raw_files_batch_async(pxid_list: list, concurrency: int = 50) -> Dict[str, Dict]:
+    """批量统计多个数据集的 RAW 文件（异步并发）"""
     logger.info(f"开始批量统计 {len(pxid_list)} 个数据集的 RAW 文件...")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_pxid = {
-            executor.submit(count_raw_files_for_dataset, pxid): pxid
-            for pxid in pxid_list
-        }
+    async with create_session(concurrency) as session:
+        counter = RawFileCounter(session)
+        semaphore = asyncio.Semaphore(concurrency)
 
-        for future in as_completed(future_to_pxid):
-            pxid = future_to_pxid[future]
-            try:
-                result = future.result()
-                results[pxid] = result
-                logger.info(f"  {pxid}: {result['raw_file_count']} 个原始文件")
-            except Exception as e:
-                logger.error(f"{pxid} 处理失败: {e}")
-                results[pxid] = {
-                    'pxid': pxid,
-                    'raw_file_count': 0
-                }
+        async def _one(pxid):
+            async with semaphore:
+                result = await count_raw_files_for_dataset(pxid, counter)
+            logger.debug(f"  {pxid}: {result['raw_file_count']} 个原始文件")
+            return pxid, result
+
+        tasks = [asyncio.create_task(_one(pxid)) for pxid in pxid_list]
+        results = {}
+        for future in asyncio.as_completed(tasks):
+            pxid, result = await future
+            results[pxid] = result
 
     logger.info(f"批量统计完成: {len(results)} 个数据集")
     return results
+
+
+def _count_raw_files_chunk(pxid_list: list, concurrency: int) -> Dict[str, Dict]:
+    """在子进程中统计一部分数据集（每个进程有自己的事件循环和连接池）"""
+    return asyncio.run(count_raw_files_batch_async(pxid_list, concurrency=concurrency))
+
+
+def count_raw_files_batch(pxid_list: list, max_workers: int = 50,
+                          use_processes: bool = False) -> Dict[str, Dict]:
+    """
+    批量统计多个数据集的 RAW 文件（同步入口）
+
+    Args:
+        pxid_list: 数据集 ID 列表
+        max_workers: 最大并发请求数
+        use_processes: 是否把数据集分给多个进程（数据集很多、解析成为瓶颈时使用）
+    """
+    if not use_processes:
+        return asyncio.run(count_raw_files_batch_async(pxid_list, concurrency=max_workers))
+
+    # 每个进程处理一份数据集，进程内仍然使用异步并发，总并发数保持为 max_workers
+    processes = max(1, min(os.cpu_count() or 1, len(pxid_list), max_workers))
+    chunks = [pxid_list[i::processes] for i in range(processes)]
+    concurrency = max(1, max_workers // processes)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk_results in executor.map(_count_raw_files_chunk, chunks, [concurrency] * processes):
+            results.update(chunk_results)
+
+    return results
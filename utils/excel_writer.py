@@ -3,16 +3,101 @@ Excel 写入工具模块
 用于将数据导出到 Excel 文件
 """
 
+import asyncio
+import operator
 import os
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+import xlsxwriter
+from openpyxl import load_workbook
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _display_width(text: str) -> int:
+    """
+    计算文本显示宽度（中文字符算2个宽度）
+
+    Args:
+        text: 文本
+
+    Returns:
+        显示宽度
+    """
+    # 编码时丢弃非ASCII字符（如中文），差值即为非ASCII字符数，无需逐字符循环
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    return 2 * len(text) - ascii_count
+
+
+class ExcelRowStream:
+    """逐行写入 Excel 文件（xlsxwriter constant_memory 模式），写入时直接带上格式"""
+
+    def __init__(self, filepath: str, sheet_name: str, columns: List[str]):
+        """
+        创建工作簿并写入标题行
+
+        Args:
+            filepath: 输出文件路径
+            sheet_name: 工作表名称
+            columns: 列名列表
+        """
+        self.filepath = filepath
+        self.columns = columns
+        self.row_count = 0
+
+        # 所有列都存在时用 itemgetter 一次取出整行（C 实现），缺列时再逐列取值
+        if len(columns) > 1:
+            self._getter = operator.itemgetter(*columns)
+        else:
+            self._getter = lambda row: tuple(row[col] for col in columns)
+
+        # constant_memory 模式下逐行写入磁盘，内存占用与行数无关
+        self.workbook = xlsxwriter.Workbook(filepath, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd'
+        })
+        self.worksheet = self.workbook.add_worksheet(sheet_name)
+
+        # 标题行样式和数据行对齐方式
+        header_format = self.workbook.add_format({
+            'bold': True, 'font_color': 'white', 'bg_color': '#4472C4',
+            'align': 'center', 'valign': 'vcenter', 'text_wrap': True
+        })
+        self._cell_format = self.workbook.add_format({
+            'align': 'left', 'valign': 'top', 'text_wrap': True
+        })
+
+        self.worksheet.write_row(0, 0, columns, header_format)
+        # 边写边记录每列的最大显示宽度，关闭时设置列宽
+        self._widths = [_display_width(str(col)) for col in columns]
+
+    def write(self, row: Dict):
+        """写入一行数据"""
+        try:
+            values = self._getter(row)
+        except KeyError:
+            values = [row.get(col, '') for col in self.columns]
+
+        self.row_count += 1
+        self.worksheet.write_row(self.row_count, 0, values, self._cell_format)
+
+        widths = self._widths
+        for i, value in enumerate(values):
+            if value:
+                width = _display_width(str(value))
+                if width > widths[i]:
+                    widths[i] = width
+
+    def close(self):
+        """设置列宽并关闭工作簿，完成文件写入"""
+        # 设置列宽（最小10，最大50）
+        for i, width in enumerate(self._widths):
+            self.worksheet.set_column(i, i, min(max(width + 2, 10), 50))
+        self.workbook.close()
+
+
 class ExcelWriter:
     """Excel 文件写入器"""
 
@@ -53,103 +138,88 @@ class ExcelWriter:
         filepath = os.path.join(self.output_dir, filename)
 
         try:
-            # 使用 pandas 创建 DataFrame
-            df = pd.DataFrame(data)
+            # 按数据中出现的顺序收集所有列
+            present = dict.fromkeys(key for row in data for key in row)
 
-            # 如果指定了列名，按指定顺序排列
+            # 如果指定了列名，按指定顺序排列（只保留存在的列）
             if columns:
-                # 只保留存在的列
-                existing_columns = [col for col in columns if col in df.columns]
-                df = df[existing_columns]
+                columns = [col for col in columns if col in present]
+            else:
+                columns = list(present)
 
-            # 写入 Excel 文件
-            df.to_excel(filepath, sheet_name=self.sheet_name, index=False, engine='openpyxl')
+            stream = ExcelRowStream(filepath, self.sheet_name, columns)
+            for row in data:
+                stream.write(row)
+            stream.close()
 
             logger.info(f"成功写入 {len(data)} 条数据到 {filepath}")
 
-            # 美化 Excel 格式
-            self._format_excel(filepath)
-
             return filepath
 
         except Exception as e:
             logger.error(f"写入 Excel 文件失败: {e}")
             raise
 
-    def _format_excel(self, filepath: str):
+    async def write_stream(self, rows: AsyncIterator[Dict], filename: str,
+                           columns: List[str]) -> str:
         """
-        美化 Excel 文件格式
+        边接收数据边写入 Excel 文件（不在内存中保留全部数据）
 
         Args:
-            filepath: Excel 文件路径
-        """
-        try:
-            from openpyxl import load_workbook
-
-            # 加载工作簿
-            wb = load_workbook(filepath)
-            ws = wb.active
-
-            # 设置标题行样式
-            header_font = Font(bold=True, color='FFFFFF')
-            header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-            # 应用标题行样式
-            for cell in ws[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-
-            # 自动调整列宽
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-
-                for cell in column:
-                    try:
-                        if cell.value:
-                            # 计算字符串长度（中文算2个字符）
-                            length = self._get_display_width(str(cell.value))
-                            if length > max_length:
-                                max_length = length
-                    except:
-                        pass
-
-                # 设置列宽（最小10，最大50）
-                adjusted_width = min(max(max_length + 2, 10), 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-
-            # 设置对齐方式
-            for row in ws.iter_rows(min_row=2):
-                for cell in row:
-                    cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-
-            # 保存修改
-            wb.save(filepath)
-            logger.info(f"Excel 格式美化完成")
-
-        except Exception as e:
-            logger.warning(f"美化 Excel 格式失败: {e}")
+            rows: 异步数据流
+            filename: 文件名
+            columns: 列名列表
 
-    @staticmethod
-    def _get_display_width(text: str) -> int:
+        Returns:
+            输出文件的完整路径（没有任何数据时返回 None）
         """
-        计算文本显示宽度（中文字符算2个宽度）
+        filepath = os.path.join(self.output_dir, filename)
+        loop = asyncio.get_running_loop()
+        # 有界队列：写入跟不上时抓取端会被挂起，内存占用保持平稳
+        queue = asyncio.Queue(maxsize=256)
+
+        async def produce():
+            try:
+                async for row in rows:
+                    await queue.put(row)
+            finally:
+                # None 表示数据结束，通知写入线程退出
+                await queue.put(None)
+
+        def consume(stream: ExcelRowStream):
+            # 在线程中写盘，磁盘 I/O 与网络 I/O 重叠进行
+            try:
+                while True:
+                    row = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+                    if row is None:
+                        break
+                    stream.write(row)
+            finally:
+                stream.close()
 
-        Args:
-            text: 文本
+        try:
+            stream = ExcelRowStream(filepath, self.sheet_name, columns)
+            producer = asyncio.ensure_future(produce())
+            writer = loop.run_in_executor(None, consume, stream)
+            try:
+                await asyncio.gather(producer, writer)
+            except BaseException:
+                # 任意一端失败都停止另一端，避免生产者阻塞在已满的队列上
+                producer.cancel()
+                raise
+
+            if not stream.row_count:
+                logger.warning("没有数据需要写入")
+                os.remove(filepath)
+                return None
+
+            logger.info(f"成功写入 {stream.row_count} 条数据到 {filepath}")
 
-        Returns:
-            显示宽度
-        """
-        width = 0
-        for char in text:
-            if ord(char) > 127:  # 非ASCII字符（如中文）
-                width += 2
-            else:
-                width += 1
-        return width
+            return filepath
+
+        except Exception as e:
+            logger.error(f"写入 Excel 文件失败: {e}")
+            raise
 
     def append_to_excel(self, data: List[Dict], filename: str,
                        columns: List[str] = None) -> str:
@@ -169,16 +239,21 @@ class ExcelWriter:
         try:
             # 检查文件是否存在
             if os.path.exists(filepath):
-                # 读取现有数据
-                existing_df = pd.read_excel(filepath, engine='openpyxl')
-                new_df = pd.DataFrame(data)
+                # 直接在原工作表末尾追加新行，不读入和重写已有数据（也保留原有格式）
+                wb = load_workbook(filepath)
+                ws = wb[self.sheet_name] if self.sheet_name in wb.sheetnames else wb.active
+                header = [cell.value for cell in ws[1]]
+
+                # 新数据中出现的新列追加到表头末尾
+                for col in dict.fromkeys(key for row in data for key in row):
+                    if col not in header:
+                        header.append(col)
+                        ws.cell(row=1, column=len(header), value=col)
 
-                # 合并数据
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+                for row in data:
+                    ws.append([row.get(col) for col in header])
 
-                # 写回文件
-                combined_df.to_excel(filepath, sheet_name=self.sheet_name,
-                                    index=False, engine='openpyxl')
+                wb.save(filepath)
 
                 logger.info(f"成功追加 {len(data)} 条数据到 {filepath}")
             else:
@@ -191,13 +266,15 @@ class ExcelWriter:
             logger.error(f"追加数据到 Excel 失败: {e}")
             raise
 
-    def write_multiple_sheets(self, data_dict: Dict[str, List[Dict]], filename: str):
+    def write_multiple_sheets(self, data_dict: Dict[str, List[Dict]], filename: str,
+                              columns: List[str] = None):
         """
         写入多个工作表
 
         Args:
             data_dict: 字典，键为工作表名，值为数据列表
             filename: 文件名
+            columns: 列名列表（可选，所有工作表共用）
 
         Returns:
             输出文件的完整路径
@@ -208,7 +285,11 @@ class ExcelWriter:
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 for sheet_name, data in data_dict.items():
                     if data:
-                        df = pd.DataFrame(data)
+                        # 已知列名时用 from_records 按给定列构建，跳过逐行推断列
+                        if columns:
+                            df = pd.DataFrame.from_records(data, columns=columns)
+                        else:
+                            df = pd.DataFrame(data)
                         df.to_excel(writer, sheet_name=sheet_name, index=False)
 
             logger.info(f"成功写入多个工作表到 {filepath}")
@@ -0,0 +1,25 @@
+"""
+JSON 解析工具模块
+使用 orjson 快速解析接口响应，并容忍非 UTF-8 字节
+"""
+
+import orjson
+
+
+def loads_json(content: bytes):
+    """
+    解析 JSON 响应
+
+    orjson 只接受合法的 UTF-8；部分仓库（如 MassIVE）会返回夹杂 Latin-1 字节的内容，
+    此时把无法解码的字节替换后再解析，避免整个响应被当作解析失败
+
+    Args:
+        content: 响应原始字节
+
+    Returns:
+        解码后的 JSON 对象
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return orjson.loads(content.decode('utf-8', 'replace'))
@@ -0,0 +1,58 @@
+"""
+请求合并工具模块
+同一个键的并发请求只真正执行一次，其他调用方共享同一个结果
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class RequestCoalescer:
+    """进行中请求的合并器"""
+
+    def __init__(self):
+        # 键 -> [请求任务, 正在等待的调用方数量]
+        self._inflight: Dict[Hashable, List] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行请求；若相同键的请求正在进行，则等待其结果而不重复发起
+
+        某个调用方被取消时只停止它自己的等待；最后一个调用方也被取消时，才取消实际的请求
+
+        Args:
+            key: 请求键（如 pxid 或 URL）
+            factory: 创建请求协程的函数
+
+        Returns:
+            请求结果
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda t: self._on_done(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # 已经没有调用方在等待结果，取消请求；之后的调用方会重新发起
+                self._forget(key, entry)
+                task.cancel()
+
+    def _on_done(self, key: Hashable, entry: List):
+        """请求结束后移除记录，并取走异常（调用方都已离开时避免"异常未被获取"的警告）"""
+        self._forget(key, entry)
+        task = entry[0]
+        if not task.cancelled():
+            task.exception()
+
+    def _forget(self, key: Hashable, entry: List):
+        """移除键对应的记录（仅当记录仍是同一个请求时）"""
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]